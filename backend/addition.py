@@ -1,36 +1,40 @@
 import math
 
-def __a_bunch_of_additions(**kwargs):
-    return sum(kwargs.values())
+def _adds(values):
+    return sum(values)
 
-def __a_bunch_of_multiplications(**kwargs):
-    return math.prod(kwargs.values())
+def _mults(values):
+    return math.prod(values)
 
-def __a_bunch_of_subtractions(**kwargs):
-    values = list(kwargs.values())
-    return values[0] - sum(values[1:])
+def _subs(values):
+    values = iter(values)
+    first = next(values)
+    return first - sum(values)
 
-def __a_bunch_of_divisions(**kwargs):
-    values = list(kwargs.values())
-    if 0 in values[1:]:
+def _divs(values):
+    values = iter(values)
+    first = next(values)
+    # The divisor product is zero exactly when one of the divisors is
+    divisor = math.prod(values)
+    if divisor == 0:
         return "Error: Division by zero"
-    return values[0] / math.prod(values[1:])
+    return first / divisor
 
 class MultiCalculator:
     def __init__(self, values: list[int]):
         self.values = values
 
     def a_bunch_of_additions(self):
-        return __a_bunch_of_additions(**self.values)
+        return _adds(self.values)
     def a_bunch_of_multiplications(self):
-        return __a_bunch_of_multiplications(**self.values)
+        return _mults(self.values)
     def a_bunch_of_subtractions(self):
-        return __a_bunch_of_subtractions(**self.values)
+        return _subs(self.values)
     def a_bunch_of_divisions(self):
-        return __a_bunch_of_divisions(**self.values)
+        return _divs(self.values)
 
 multi_calculator = MultiCalculator([1, 2, 3])
 assert multi_calculator.a_bunch_of_additions() == 6
 assert multi_calculator.a_bunch_of_multiplications() == 6
 assert multi_calculator.a_bunch_of_subtractions() == -4
-assert multi_calculator.a_bunch_of_divisions() == 0.16666666666666666
\ No newline at end of file
+assert multi_calculator.a_bunch_of_divisions() == 0.16666666666666666
@@ -1,19 +1,109 @@
+import heapq
+import logging
+import queue
 import sqlite3
 import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
 
 DB_PATH = Path(__file__).parent / "contention.db"
 
-# In-memory distributed locks simulation
+# Per-connection tuning; journal_mode=WAL is persistent and set once in init_db()
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Long-lived connections shared across requests instead of reconnecting each time
+POOL_SIZE = 8
+_pool: queue.Queue[sqlite3.Connection] = queue.Queue(maxsize=POOL_SIZE)
+
+# In-memory distributed locks simulation, striped so unrelated resources never
+# contend on the same mutex
+LOCK_SHARDS = 16
 distributed_locks: dict[str, dict] = {}
-lock_mutex = threading.Lock()
+_lock_shards = [threading.Lock() for _ in range(LOCK_SHARDS)]
+
+# Min-heap of (expires_at, resource_id) consumed by the lock reaper thread
+_expiry_heap: list[tuple[float, str]] = []
+_expiry_cond = threading.Condition()
+_lock_reaper: threading.Thread | None = None
+
+# Transaction log rows waiting for the writer thread; None tells it to stop
+LOG_BATCH_SIZE = 64
+LOG_BATCH_WINDOW = 0.05
+_log_queue: queue.Queue[tuple | None] = queue.Queue()
+_log_writer: threading.Thread | None = None
+
+def lock_for(resource_id: str) -> threading.Lock:
+    """Get the mutex guarding a resource's entry in distributed_locks."""
+    return _lock_shards[hash(resource_id) % LOCK_SHARDS]
+
+def schedule_lock_expiry(resource_id: str, expires_at: float):
+    """Have the reaper drop a distributed lock once it reaches expires_at."""
+    with _expiry_cond:
+        heapq.heappush(_expiry_heap, (expires_at, resource_id))
+        _expiry_cond.notify()
+
+def _reap_expired_locks():
+    """Reaper thread: sleep until the earliest expiry, then drop that lock."""
+    while True:
+        with _expiry_cond:
+            while _lock_reaper is not None and (not _expiry_heap or _expiry_heap[0][0] > time.time()):
+                _expiry_cond.wait(_expiry_heap[0][0] - time.time() if _expiry_heap else None)
+            if _lock_reaper is None:
+                return
+            expires_at, resource_id = heapq.heappop(_expiry_heap)
+
+        # Taken after releasing _expiry_cond: handlers schedule expiries while holding this
+        with lock_for(resource_id):
+            lock_info = distributed_locks.get(resource_id)
+            # Entries left behind by a TTL extension or a newer lock no longer match
+            if lock_info and lock_info["expires_at"] == expires_at:
+                del distributed_locks[resource_id]
+                log_transaction("distributed", "LOCK_EXPIRED", f"Lock by {lock_info['holder']} expired", True)
+
+def start_lock_reaper():
+    """Start the background thread that expires distributed locks."""
+    global _lock_reaper
+    if _lock_reaper is None:
+        _lock_reaper = threading.Thread(target=_reap_expired_locks, name="lock-reaper", daemon=True)
+        _lock_reaper.start()
+
+def stop_lock_reaper():
+    """Stop the lock reaper thread."""
+    global _lock_reaper
+    reaper = _lock_reaper
+    if reaper is not None:
+        with _expiry_cond:
+            _lock_reaper = None
+            _expiry_cond.notify()
+        reaper.join()
+
+def _connect():
+    """Open a connection with the busy timeout and tuning PRAGMAs applied."""
+    # timeout sets SQLite's busy_timeout: wait up to 30s for the writer instead of failing.
+    # isolation_level=None turns off the driver's implicit BEGIN; writers that need more
+    # than one statement open their own transaction, usually BEGIN IMMEDIATE.
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    conn.row_factory = sqlite3.Row
+    return conn
 
 def init_db():
     """Initialize the database with tables for demos."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
+    # WAL lets readers proceed alongside a single writer instead of blocking on it
+    conn.execute("PRAGMA journal_mode = WAL")
     cursor = conn.cursor()
 
+    # Create and seed everything in one write transaction
+    cursor.execute("BEGIN IMMEDIATE")
+
     # Table for pessimistic locking demo - bank account
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS accounts (
@@ -35,7 +125,17 @@ def init_db():
         )
     """)
 
-    # Table for transaction log
+    # Covers the version check in optimistic_update without touching the table row
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_id_version ON inventory (id, version)")
+
+    # Older databases stored log timestamps as REAL seconds; move them aside for conversion
+    cursor.execute("SELECT type FROM pragma_table_info('transaction_log') WHERE name = 'timestamp'")
+    legacy_log = cursor.fetchone()
+    if legacy_log and legacy_log["type"] == "REAL":
+        cursor.execute("DROP INDEX IF EXISTS idx_log_demo_ts")
+        cursor.execute("ALTER TABLE transaction_log RENAME TO transaction_log_legacy")
+
+    # Table for transaction log; timestamp is integer microseconds since the epoch
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS transaction_log (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,75 +143,161 @@ def init_db():
             action TEXT NOT NULL,
             details TEXT,
             success INTEGER NOT NULL,
-            timestamp REAL NOT NULL
+            timestamp INTEGER NOT NULL
         )
     """)
 
-    # Insert default data if empty
-    cursor.execute("SELECT COUNT(*) FROM accounts")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute("INSERT INTO accounts (id, name, balance) VALUES (1, 'Shared Account', 1000)")
+    if legacy_log and legacy_log["type"] == "REAL":
+        cursor.execute("""
+            INSERT INTO transaction_log (id, demo_type, action, details, success, timestamp)
+            SELECT id, demo_type, action, details, success, CAST(timestamp * 1000000 AS INTEGER)
+            FROM transaction_log_legacy
+        """)
+        cursor.execute("DROP TABLE transaction_log_legacy")
 
-    cursor.execute("SELECT COUNT(*) FROM inventory")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute("INSERT INTO inventory (id, product, quantity, version) VALUES (1, 'Widget', 100, 1)")
+    # Lets get_recent_logs read the newest rows per demo straight off the index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_log_demo_ts ON transaction_log (demo_type, timestamp DESC)")
+
+    # Insert default rows; the primary key makes this a no-op once they exist
+    cursor.execute("INSERT OR IGNORE INTO accounts (id, name, balance) VALUES (1, 'Shared Account', 1000)")
+    cursor.execute("INSERT OR IGNORE INTO inventory (id, product, quantity, version) VALUES (1, 'Widget', 100, 1)")
 
     conn.commit()
     conn.close()
 
+    while not _pool.full():
+        _pool.put_nowait(_connect())
+
 @contextmanager
 def get_connection():
-    """Get a database connection with proper cleanup."""
-    conn = sqlite3.connect(DB_PATH, timeout=10)
-    conn.row_factory = sqlite3.Row
+    """Borrow a pooled database connection and hand it back when done."""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        # Never block on an exhausted pool; open an overflow connection instead
+        conn = _connect()
     try:
         yield conn
     finally:
-        conn.close()
+        # Don't let an abandoned transaction leak into the next borrower
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
 def reset_database():
     """Reset all tables to initial state."""
+    # Make sure queued logs land before the log table is cleared
+    flush_logs()
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
         cursor.execute("UPDATE accounts SET balance = 1000, locked_by = NULL, locked_at = NULL WHERE id = 1")
         cursor.execute("UPDATE inventory SET quantity = 100, version = 1 WHERE id = 1")
         cursor.execute("DELETE FROM transaction_log")
         conn.commit()
 
-    # Clear distributed locks
-    with lock_mutex:
+    # Clear distributed locks, holding every shard so no entry is mid-update
+    for mutex in _lock_shards:
+        mutex.acquire()
+    try:
         distributed_locks.clear()
+        with _expiry_cond:
+            _expiry_heap.clear()
+    finally:
+        for mutex in _lock_shards:
+            mutex.release()
 
     return {"message": "Database reset to initial state"}
 
 def log_transaction(demo_type: str, action: str, details: str, success: bool):
-    """Log a transaction for display in the UI."""
-    import time
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO transaction_log (demo_type, action, details, success, timestamp) VALUES (?, ?, ?, ?, ?)",
-            (demo_type, action, details, int(success), time.time())
-        )
-        conn.commit()
+    """Log a transaction for display in the UI (written asynchronously in batches)."""
+    _log_queue.put((demo_type, action, details, int(success), time.time_ns() // 1000))
+
+def _write_logs():
+    """Writer thread: group queued log rows into one transaction per batch."""
+    conn = _connect()
+    running = True
+    while running:
+        item = _log_queue.get()
+        if item is None:
+            _log_queue.task_done()
+            break
+
+        # Collect more rows for up to LOG_BATCH_WINDOW seconds or LOG_BATCH_SIZE rows
+        batch = [item]
+        deadline = time.monotonic() + LOG_BATCH_WINDOW
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                item = _log_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                running = False
+                _log_queue.task_done()
+                break
+            batch.append(item)
+
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO transaction_log (demo_type, action, details, success, timestamp) VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+            conn.commit()
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            logging.getLogger(__name__).exception("Dropped %d transaction log rows", len(batch))
+        finally:
+            for _ in batch:
+                _log_queue.task_done()
+    conn.close()
+
+def start_log_writer():
+    """Start the background thread that persists transaction logs."""
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = threading.Thread(target=_write_logs, name="log-writer", daemon=True)
+        _log_writer.start()
+
+def flush_logs():
+    """Block until every queued log row has been written."""
+    if _log_writer is not None:
+        _log_queue.join()
+
+def stop_log_writer():
+    """Flush outstanding logs and stop the writer thread."""
+    global _log_writer
+    if _log_writer is not None:
+        _log_queue.put(None)
+        _log_writer.join()
+        _log_writer = None
 
 def get_recent_logs(demo_type: str, limit: int = 20):
     """Get recent transaction logs for a demo type."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        # Pick the newest rows, then let SQLite put them back in chronological order
         cursor.execute(
-            "SELECT action, details, success, timestamp FROM transaction_log WHERE demo_type = ? ORDER BY timestamp DESC LIMIT ?",
+            """
+            SELECT action, details, success, timestamp FROM (
+                SELECT action, details, success, timestamp FROM transaction_log
+                WHERE demo_type = ? ORDER BY timestamp DESC LIMIT ?
+            ) ORDER BY timestamp ASC
+            """,
             (demo_type, limit)
         )
-        rows = cursor.fetchall()
         return [
             {
                 "action": row["action"],
                 "details": row["details"],
                 "success": bool(row["success"]),
-                "timestamp": row["timestamp"]
+                "timestamp": row["timestamp"] / 1_000_000
             }
-            for row in reversed(rows)
+            for row in cursor
         ]
 
 # Initialize database on module load
@@ -1,7 +1,8 @@
-from datetime import datetime
 import random
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from routers.realtime import router as realtime_router
 from routers.contention import router as contention_router
@@ -10,7 +11,9 @@ from routers.reads import router as reads_router
 from routers.writes import router as writes_router
 from routers.tasks import router as tasks_router
 
-app = FastAPI()
+HEALTH_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.include_router(realtime_router)
 app.include_router(contention_router)
 app.include_router(workflows_router)
@@ -29,6 +32,7 @@ app.add_middleware(
 
 @app.get("/api/health")
 def health():
+    # Fail half the time for the demo, without going through exception handling
     if random.random() < 0.5:
-        raise Exception("Random error")
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+        return ORJSONResponse({"error": "Random error"}, status_code=500)
+    return {"status": "ok", "timestamp": time.strftime(HEALTH_TIMESTAMP_FORMAT)}
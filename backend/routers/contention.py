@@ -1,7 +1,11 @@
 import asyncio
+import hashlib
+import secrets
 import time
-import uuid
-from fastapi import APIRouter, HTTPException
+from contextlib import asynccontextmanager
+
+import orjson
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
 
 from database import (
@@ -10,10 +14,43 @@ from database import (
     log_transaction,
     get_recent_logs,
     distributed_locks,
-    lock_mutex,
+    lock_for,
+    schedule_lock_expiry,
+    start_log_writer,
+    stop_log_writer,
+    start_lock_reaper,
+    stop_lock_reaper,
 )
+from routers._contention_info import CONTENTION_INFO
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the transaction log writer and distributed lock reaper for the app's lifetime."""
+    start_log_writer()
+    start_lock_reaper()
+    yield
+    await asyncio.to_thread(stop_lock_reaper)
+    await asyncio.to_thread(stop_log_writer)
+
 
-router = APIRouter(prefix="/api/contention", tags=["contention"])
+router = APIRouter(prefix="/api/contention", tags=["contention"], lifespan=lifespan)
+
+# Handlers that only do blocking SQLite work are plain `def` so FastAPI runs them
+# in its threadpool; handlers that also await move their DB work to a thread.
+
+
+# Statements used by the handlers below, kept in one place
+_SQL_GET_ACCOUNT = "SELECT balance, locked_by, locked_at FROM accounts WHERE id = 1"
+_SQL_GET_ACCOUNT_LOCK = "SELECT locked_by, locked_at FROM accounts WHERE id = 1"
+_SQL_LOCK_ACCOUNT = "UPDATE accounts SET locked_by = ?, locked_at = ? WHERE id = 1"
+_SQL_WITHDRAW = "UPDATE accounts SET balance = balance - ? WHERE id = 1 AND locked_by = ? AND balance >= ? RETURNING balance"
+_SQL_GET_BALANCE = "SELECT balance, locked_by FROM accounts WHERE id = 1"
+_SQL_GET_LOCK_HOLDER = "SELECT locked_by FROM accounts WHERE id = 1"
+_SQL_UNLOCK_ACCOUNT = "UPDATE accounts SET locked_by = NULL, locked_at = NULL WHERE id = 1"
+_SQL_GET_INVENTORY = "SELECT product, quantity, version FROM inventory WHERE id = 1"
+_SQL_GET_INVENTORY_VERSION = "SELECT quantity, version FROM inventory WHERE id = 1"
+_SQL_UPDATE_INVENTORY = "UPDATE inventory SET quantity = ?, version = ? WHERE id = 1 AND version = ?"
 
 
 # ============ Pessimistic Locking Demo ============
@@ -25,11 +62,11 @@ class TransferRequest(BaseModel):
 
 
 @router.get("/pessimistic/state")
-async def get_pessimistic_state():
+def get_pessimistic_state():
     """Get current account state and logs."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT balance, locked_by, locked_at FROM accounts WHERE id = 1")
+        cursor.execute(_SQL_GET_ACCOUNT)
         row = cursor.fetchone()
         return {
             "balance": row["balance"],
@@ -40,18 +77,22 @@ async def get_pessimistic_state():
 
 
 @router.post("/pessimistic/lock")
-async def acquire_pessimistic_lock(client_id: str):
+def acquire_pessimistic_lock(client_id: str):
     """Attempt to acquire a lock on the account (SELECT ... FOR UPDATE simulation)."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        now = time.time()
+
+        # Take the write lock before reading so two clients can't both see it free
+        cursor.execute("BEGIN IMMEDIATE")
 
         # Check if already locked
-        cursor.execute("SELECT locked_by, locked_at FROM accounts WHERE id = 1")
+        cursor.execute(_SQL_GET_ACCOUNT_LOCK)
         row = cursor.fetchone()
 
         if row["locked_by"] and row["locked_by"] != client_id:
             # Check if lock is stale (> 30 seconds)
-            if time.time() - (row["locked_at"] or 0) < 30:
+            if now - (row["locked_at"] or 0) < 30:
                 log_transaction("pessimistic", "LOCK_BLOCKED", f"{client_id} blocked by {row['locked_by']}", False)
                 return {
                     "success": False,
@@ -60,58 +101,64 @@ async def acquire_pessimistic_lock(client_id: str):
                 }
 
         # Acquire lock
-        cursor.execute(
-            "UPDATE accounts SET locked_by = ?, locked_at = ? WHERE id = 1",
-            (client_id, time.time())
-        )
+        cursor.execute(_SQL_LOCK_ACCOUNT, (client_id, now))
         conn.commit()
         log_transaction("pessimistic", "LOCK_ACQUIRED", f"{client_id} acquired lock", True)
 
         return {"success": True, "message": "Lock acquired", "holder": client_id}
 
 
-@router.post("/pessimistic/withdraw")
-async def pessimistic_withdraw(request: TransferRequest):
-    """Withdraw with pessimistic locking - must hold lock first."""
+def _withdraw(request: TransferRequest) -> int:
+    """Debit the account if the client holds the lock and has the funds, returning the new balance."""
     with get_connection() as conn:
         cursor = conn.cursor()
 
-        # Verify lock ownership
-        cursor.execute("SELECT balance, locked_by FROM accounts WHERE id = 1")
+        # Check lock ownership and funds and debit in one statement
+        cursor.execute(_SQL_WITHDRAW, (request.amount, request.client_id, request.amount))
         row = cursor.fetchone()
 
-        if row["locked_by"] != request.client_id:
-            log_transaction("pessimistic", "WITHDRAW_DENIED", f"{request.client_id} doesn't hold lock", False)
-            raise HTTPException(status_code=403, detail="You don't hold the lock")
+        if row is None:
+            # Nothing was debited; look at the row to report why
+            cursor.execute(_SQL_GET_BALANCE)
+            row = cursor.fetchone()
+
+            if row["locked_by"] != request.client_id:
+                log_transaction("pessimistic", "WITHDRAW_DENIED", f"{request.client_id} doesn't hold lock", False)
+                raise HTTPException(status_code=403, detail="You don't hold the lock")
 
-        if row["balance"] < request.amount:
             log_transaction("pessimistic", "WITHDRAW_FAILED", f"Insufficient funds: {row['balance']} < {request.amount}", False)
             raise HTTPException(status_code=400, detail="Insufficient funds")
 
-        # Simulate some processing time
-        await asyncio.sleep(0.5)
+    new_balance = row["balance"]
+    log_transaction("pessimistic", "WITHDRAW_SUCCESS", f"{request.client_id} withdrew {request.amount}, new balance: {new_balance}", True)
+    return new_balance
 
-        new_balance = row["balance"] - request.amount
-        cursor.execute("UPDATE accounts SET balance = ? WHERE id = 1", (new_balance,))
-        conn.commit()
 
-        log_transaction("pessimistic", "WITHDRAW_SUCCESS", f"{request.client_id} withdrew {request.amount}, new balance: {new_balance}", True)
-        return {"success": True, "new_balance": new_balance, "amount": request.amount}
+@router.post("/pessimistic/withdraw")
+async def pessimistic_withdraw(request: TransferRequest):
+    """Withdraw with pessimistic locking - must hold lock first."""
+    new_balance = await asyncio.to_thread(_withdraw, request)
+
+    # Simulate some processing time
+    await asyncio.sleep(0.5)
+
+    return {"success": True, "new_balance": new_balance, "amount": request.amount}
 
 
 @router.post("/pessimistic/release")
-async def release_pessimistic_lock(client_id: str):
+def release_pessimistic_lock(client_id: str):
     """Release the lock on the account."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
 
-        cursor.execute("SELECT locked_by FROM accounts WHERE id = 1")
+        cursor.execute(_SQL_GET_LOCK_HOLDER)
         row = cursor.fetchone()
 
         if row["locked_by"] != client_id:
             return {"success": False, "message": "You don't hold the lock"}
 
-        cursor.execute("UPDATE accounts SET locked_by = NULL, locked_at = NULL WHERE id = 1")
+        cursor.execute(_SQL_UNLOCK_ACCOUNT)
         conn.commit()
         log_transaction("pessimistic", "LOCK_RELEASED", f"{client_id} released lock", True)
 
@@ -128,11 +175,11 @@ class InventoryUpdate(BaseModel):
 
 
 @router.get("/optimistic/state")
-async def get_optimistic_state():
+def get_optimistic_state():
     """Get current inventory state and logs."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT product, quantity, version FROM inventory WHERE id = 1")
+        cursor.execute(_SQL_GET_INVENTORY)
         row = cursor.fetchone()
         return {
             "product": row["product"],
@@ -142,18 +189,18 @@ async def get_optimistic_state():
         }
 
 
-@router.post("/optimistic/update")
-async def optimistic_update(request: InventoryUpdate):
-    """Update inventory with optimistic concurrency control."""
+def _read_inventory():
+    """Read the inventory row an optimistic update is based on."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.execute(_SQL_GET_INVENTORY_VERSION)
+        return cursor.fetchone()
 
-        # Simulate reading data and preparing update
-        cursor.execute("SELECT quantity, version FROM inventory WHERE id = 1")
-        row = cursor.fetchone()
 
-        # Simulate some processing delay to increase conflict chance
-        await asyncio.sleep(0.3)
+def _apply_optimistic_update(request: InventoryUpdate, row) -> dict:
+    """Validate the version read earlier and apply the update if it still matches."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
         # Check version hasn't changed
         if row["version"] != request.expected_version:
@@ -182,11 +229,8 @@ async def optimistic_update(request: InventoryUpdate):
 
         new_version = row["version"] + 1
 
-        # Atomic update with version check
-        cursor.execute(
-            "UPDATE inventory SET quantity = ?, version = ? WHERE id = 1 AND version = ?",
-            (new_quantity, new_version, request.expected_version)
-        )
+        # Atomic update with version check; a single statement commits on its own
+        cursor.execute(_SQL_UPDATE_INVENTORY, (new_quantity, new_version, request.expected_version))
 
         if cursor.rowcount == 0:
             # Another transaction beat us
@@ -197,7 +241,6 @@ async def optimistic_update(request: InventoryUpdate):
                 "message": "Lost race condition during commit",
             }
 
-        conn.commit()
         action = "INCREASE" if request.quantity_change > 0 else "DECREASE"
         log_transaction(
             "optimistic",
@@ -213,20 +256,30 @@ async def optimistic_update(request: InventoryUpdate):
         }
 
 
+@router.post("/optimistic/update")
+async def optimistic_update(request: InventoryUpdate):
+    """Update inventory with optimistic concurrency control."""
+    # Simulate reading data and preparing update
+    row = await asyncio.to_thread(_read_inventory)
+
+    # Simulate some processing delay to increase conflict chance
+    await asyncio.sleep(0.3)
+
+    return await asyncio.to_thread(_apply_optimistic_update, request, row)
+
+
 # ============ Distributed Lock Demo ============
-# Simulates Redis-style distributed locks with TTL
+# Simulates Redis-style distributed locks with TTL. Expired locks are removed by
+# the reaper thread, so an entry in distributed_locks is always a live lock.
 
 LOCK_TTL_SECONDS = 10
 
 
 @router.get("/distributed/state")
-async def get_distributed_state():
+def get_distributed_state():
     """Get current distributed lock state."""
-    with lock_mutex:
+    with lock_for("resource_1"):
         lock_info = distributed_locks.get("resource_1")
-        if lock_info and time.time() > lock_info["expires_at"]:
-            del distributed_locks["resource_1"]
-            lock_info = None
 
     return {
         "resource": "resource_1",
@@ -240,44 +293,43 @@ async def get_distributed_state():
 
 
 @router.post("/distributed/acquire")
-async def acquire_distributed_lock(client_id: str, ttl: int = LOCK_TTL_SECONDS):
+def acquire_distributed_lock(client_id: str, ttl: int = LOCK_TTL_SECONDS):
     """Try to acquire a distributed lock (like Redis SETNX with TTL)."""
-    with lock_mutex:
+    with lock_for("resource_1"):
         lock_info = distributed_locks.get("resource_1")
+        # One clock read per critical section; expires_at stays wall-clock as it's returned to clients
+        now = time.time()
+        expires_at = now + ttl
 
-        # Check if lock exists and is not expired
+        # Check if lock is already held
         if lock_info:
-            if time.time() < lock_info["expires_at"]:
-                if lock_info["holder"] == client_id:
-                    # Extend TTL if same holder
-                    lock_info["expires_at"] = time.time() + ttl
-                    log_transaction("distributed", "LOCK_EXTENDED", f"{client_id} extended TTL", True)
-                    return {
-                        "success": True,
-                        "message": "Lock extended",
-                        "expires_at": lock_info["expires_at"],
-                        "ttl": ttl,
-                    }
-                else:
-                    log_transaction("distributed", "LOCK_BLOCKED", f"{client_id} blocked by {lock_info['holder']}", False)
-                    return {
-                        "success": False,
-                        "message": f"Lock held by {lock_info['holder']}",
-                        "holder": lock_info["holder"],
-                        "ttl_remaining": lock_info["expires_at"] - time.time(),
-                    }
+            if lock_info["holder"] == client_id:
+                # Extend TTL if same holder
+                lock_info["expires_at"] = expires_at
+                schedule_lock_expiry("resource_1", expires_at)
+                log_transaction("distributed", "LOCK_EXTENDED", f"{client_id} extended TTL", True)
+                return {
+                    "success": True,
+                    "message": "Lock extended",
+                    "expires_at": expires_at,
+                    "ttl": ttl,
+                }
             else:
-                # Lock expired, clean it up
-                log_transaction("distributed", "LOCK_EXPIRED", f"Lock by {lock_info['holder']} expired", True)
-                del distributed_locks["resource_1"]
+                log_transaction("distributed", "LOCK_BLOCKED", f"{client_id} blocked by {lock_info['holder']}", False)
+                return {
+                    "success": False,
+                    "message": f"Lock held by {lock_info['holder']}",
+                    "holder": lock_info["holder"],
+                    "ttl_remaining": max(0, lock_info["expires_at"] - now),
+                }
 
         # Acquire the lock
-        expires_at = time.time() + ttl
         distributed_locks["resource_1"] = {
             "holder": client_id,
             "expires_at": expires_at,
-            "lock_id": str(uuid.uuid4())[:8],
+            "lock_id": secrets.token_hex(4),
         }
+        schedule_lock_expiry("resource_1", expires_at)
         log_transaction("distributed", "LOCK_ACQUIRED", f"{client_id} acquired lock (TTL: {ttl}s)", True)
 
         return {
@@ -289,9 +341,9 @@ async def acquire_distributed_lock(client_id: str, ttl: int = LOCK_TTL_SECONDS):
 
 
 @router.post("/distributed/release")
-async def release_distributed_lock(client_id: str):
+def release_distributed_lock(client_id: str):
     """Release a distributed lock."""
-    with lock_mutex:
+    with lock_for("resource_1"):
         lock_info = distributed_locks.get("resource_1")
 
         if not lock_info:
@@ -307,28 +359,21 @@ async def release_distributed_lock(client_id: str):
         return {"success": True, "message": "Lock released"}
 
 
-@router.post("/distributed/work")
-async def do_distributed_work(client_id: str, duration: float = 2.0):
-    """Simulate doing work while holding the lock."""
-    with lock_mutex:
+def _start_distributed_work(client_id: str, duration: float):
+    """Verify the caller holds the lock before starting work."""
+    with lock_for("resource_1"):
         lock_info = distributed_locks.get("resource_1")
 
         if not lock_info or lock_info["holder"] != client_id:
             log_transaction("distributed", "WORK_DENIED", f"{client_id} tried to work without lock", False)
             raise HTTPException(status_code=403, detail="You don't hold the lock")
 
-        if time.time() > lock_info["expires_at"]:
-            log_transaction("distributed", "LOCK_EXPIRED", f"{client_id}'s lock expired during work", False)
-            del distributed_locks["resource_1"]
-            raise HTTPException(status_code=410, detail="Lock expired")
-
     log_transaction("distributed", "WORK_STARTED", f"{client_id} started work ({duration}s)", True)
 
-    # Simulate work
-    await asyncio.sleep(duration)
 
-    # Check lock still held after work
-    with lock_mutex:
+def _finish_distributed_work(client_id: str) -> dict:
+    """Check the lock survived the work and record the outcome."""
+    with lock_for("resource_1"):
         lock_info = distributed_locks.get("resource_1")
         if not lock_info or lock_info["holder"] != client_id:
             log_transaction("distributed", "WORK_INTERRUPTED", f"{client_id}'s lock was taken during work", False)
@@ -338,70 +383,35 @@ async def do_distributed_work(client_id: str, duration: float = 2.0):
     return {"success": True, "message": "Work completed successfully"}
 
 
+@router.post("/distributed/work")
+async def do_distributed_work(client_id: str, duration: float = 2.0):
+    """Simulate doing work while holding the lock."""
+    await asyncio.to_thread(_start_distributed_work, client_id, duration)
+
+    # Simulate work
+    await asyncio.sleep(duration)
+
+    # Check lock still held after work
+    return await asyncio.to_thread(_finish_distributed_work, client_id)
+
+
 # ============ Utility Endpoints ============
 
 @router.post("/reset")
-async def reset_all():
+def reset_all():
     """Reset all demo data to initial state."""
     result = reset_database()
     return result
 
 
+# The payload never changes, so serialize it once and let clients revalidate by ETag
+_INFO_BODY = orjson.dumps(CONTENTION_INFO)
+_INFO_ETAG = f'"{hashlib.sha256(_INFO_BODY).hexdigest()[:16]}"'
+
+
 @router.get("/info")
-async def get_contention_info():
+async def get_contention_info(if_none_match: str | None = Header(default=None)):
     """Returns information about contention handling mechanisms."""
-    return {
-        "single_node": {
-            "atomicity": {
-                "name": "Atomicity (Database Transactions)",
-                "description": "Groups operations so they all succeed or all fail together using BEGIN TRANSACTION / COMMIT / ROLLBACK.",
-                "use_case": "Ensuring data consistency within a single database",
-                "limitation": "Doesn't prevent concurrent transactions from reading same data",
-            },
-            "pessimistic_locking": {
-                "name": "Pessimistic Locking",
-                "description": "Acquires locks upfront using SELECT ... FOR UPDATE to block other transactions.",
-                "use_case": "High contention scenarios",
-                "latency": "Low",
-                "complexity": "Low",
-            },
-            "isolation_levels": {
-                "name": "Isolation Levels",
-                "description": "Let the database handle conflicts by raising isolation level. SERIALIZABLE is strongest.",
-                "use_case": "Need automatic conflict detection",
-                "latency": "Medium",
-                "complexity": "Low",
-            },
-            "occ": {
-                "name": "Optimistic Concurrency Control",
-                "description": "Assumes conflicts are rare, detects them via version numbers after they occur.",
-                "use_case": "Low contention, high throughput scenarios",
-                "latency": "Low (no conflicts)",
-                "complexity": "Medium",
-            },
-        },
-        "multi_node": {
-            "two_phase_commit": {
-                "name": "Two-Phase Commit (2PC)",
-                "description": "Coordinator asks participants to prepare, then commit or abort based on responses.",
-                "use_case": "Must have cross-system atomicity",
-                "latency": "High",
-                "complexity": "Very High",
-                "tradeoff": "Expensive and fragile - coordinator crashes can leave participants in limbo",
-            },
-            "distributed_locks": {
-                "name": "Distributed Locks",
-                "description": "Ensures only one process can work on a resource across the entire system.",
-                "implementations": ["Redis with TTL", "Database columns with cleanup jobs", "ZooKeeper/etcd"],
-                "use_case": "User-facing flows, reservations",
-                "latency": "Low",
-                "complexity": "Medium",
-            },
-            "saga": {
-                "name": "Saga Pattern",
-                "description": "Breaks operations into independent steps with compensating transactions for rollback.",
-                "use_case": "Long-running distributed transactions",
-                "tradeoff": "Eventual consistency - system is temporarily inconsistent",
-            },
-        },
-    }
+    if if_none_match == _INFO_ETAG:
+        return Response(status_code=304, headers={"ETag": _INFO_ETAG})
+    return Response(_INFO_BODY, media_type="application/json", headers={"ETag": _INFO_ETAG})
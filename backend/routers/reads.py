@@ -1,19 +1,26 @@
 import asyncio
+import math
 import time
 import random
-from fastapi import APIRouter
+from itertools import islice
+
+import orjson
+from fastapi import APIRouter, Response
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/reads", tags=["reads"])
 
 # Simulated database with artificial delay
 database: dict[str, dict] = {}
+# Serialized copy of each database row; rewrite the entry whenever the row changes
+database_json: dict[str, bytes] = {}
 # Simulated cache
 cache: dict[str, dict] = {}
 # Read replicas (simulated)
 replicas: list[dict[str, dict]] = [{}, {}, {}]
-# Request stats
-stats = {"db_reads": 0, "cache_hits": 0, "cache_misses": 0, "replica_reads": [0, 0, 0]}
+# Request stats; reads only bump counters, /stats builds the snapshot
+stats = {"db_reads": 0, "cache_hits": 0, "cache_misses": 0}
+replica_reads = [0, 0, 0]
 # Cache versions for versioned invalidation
 cache_versions: dict[str, int] = {}
 
@@ -22,7 +29,7 @@ def reset_stats():
     stats["db_reads"] = 0
     stats["cache_hits"] = 0
     stats["cache_misses"] = 0
-    stats["replica_reads"] = [0, 0, 0]
+    replica_reads[:] = [0, 0, 0]
 
 
 # ============ Database Simulation ============
@@ -39,6 +46,7 @@ def init_sample_data():
             "views": random.randint(100, 10000),
             "version": 1,
         }
+        database_json[key] = orjson.dumps(database[key])
         cache_versions[key] = 1
     # Sync to replicas (with lag simulation)
     for replica in replicas:
@@ -55,19 +63,19 @@ class ReadRequest(BaseModel):
     key: str
 
 
+_NO_CACHE_READ_TAIL = b',"latency_ms":50,"source":"database"}'
+
+
 @router.post("/no-cache/read")
 async def read_no_cache(req: ReadRequest):
     """Read directly from database (slow)."""
     await asyncio.sleep(0.05)  # Simulate DB latency (50ms)
     stats["db_reads"] += 1
 
-    if req.key in database:
-        return {
-            "data": database[req.key],
-            "latency_ms": 50,
-            "source": "database",
-            "stats": stats.copy(),
-        }
+    row_json = database_json.get(req.key)
+    if row_json is not None:
+        # Splice the pre-serialized row into the response instead of re-encoding it
+        return Response(b'{"data":' + row_json + _NO_CACHE_READ_TAIL, media_type="application/json")
     return {"error": "Not found", "latency_ms": 50, "source": "database"}
 
 
@@ -77,34 +85,26 @@ async def read_no_cache(req: ReadRequest):
 @router.post("/cache/read")
 async def read_with_cache(req: ReadRequest):
     """Read with cache-aside pattern."""
-    start = time.time()
+    start = time.monotonic_ns()
 
     # Check cache first
-    if req.key in cache:
+    data = cache.get(req.key)
+    if data is not None:
         stats["cache_hits"] += 1
-        latency = (time.time() - start) * 1000 + 2  # ~2ms cache latency
-        return {
-            "data": cache[req.key],
-            "latency_ms": round(latency, 2),
-            "source": "cache",
-            "stats": stats.copy(),
-        }
+        latency = (time.monotonic_ns() - start) / 1_000_000 + 2  # ~2ms cache latency
+        return {"data": data, "latency_ms": round(latency, 2), "source": "cache"}
 
     # Cache miss - read from DB
     stats["cache_misses"] += 1
     await asyncio.sleep(0.05)  # Simulate DB latency
     stats["db_reads"] += 1
 
-    if req.key in database:
-        # Populate cache
-        cache[req.key] = database[req.key].copy()
-        latency = (time.time() - start) * 1000
-        return {
-            "data": database[req.key],
-            "latency_ms": round(latency, 2),
-            "source": "database (cache miss)",
-            "stats": stats.copy(),
-        }
+    row = database.get(req.key)
+    if row is not None:
+        # Populate cache with a copy so later writes to the row don't leak into it
+        data = cache[req.key] = row.copy()
+        latency = (time.monotonic_ns() - start) / 1_000_000
+        return {"data": data, "latency_ms": round(latency, 2), "source": "database (cache miss)"}
     return {"error": "Not found"}
 
 
@@ -126,23 +126,58 @@ async def clear_cache():
 
 # ============ Read Replicas Demo ============
 
+# Reads currently being served by each replica
+replica_inflight = [0, 0, 0]
+replica_rotation = 0
+# Monotonic time of the last primary write per key, for read-your-writes routing
+last_write: dict[str, float] = {}
+# Replication lag per replica, in ascending order
+REPLICATION_DELAYS = (0.1, 0.2, 0.3)
+# Reads this soon after a write go to the primary
+REPLICATION_LAG_SECONDS = max(REPLICATION_DELAYS)
+
+
+def pick_replica() -> int:
+    """Pick the replica with the fewest reads in flight, rotating between ties."""
+    global replica_rotation
+
+    replica_rotation = (replica_rotation + 1) % len(replicas)
+    return min(
+        range(len(replicas)),
+        key=lambda i: (replica_inflight[i], (i - replica_rotation) % len(replicas)),
+    )
+
 
 @router.post("/replica/read")
 async def read_from_replica(req: ReadRequest):
-    """Read from a random read replica."""
-    # Pick a random replica
-    replica_idx = random.randint(0, len(replicas) - 1)
+    """Read from the replica with the fewest reads in flight."""
+    # The replicas may not have this write yet; read it from the primary instead
+    written_at = last_write.get(req.key)
+    if written_at is not None and time.monotonic() - written_at < REPLICATION_LAG_SECONDS:
+        await asyncio.sleep(0.05)  # Primary read latency
+        if req.key in database:
+            return {
+                "data": database[req.key],
+                "latency_ms": 50,
+                "source": "primary (read-your-writes)",
+            }
+        return {"error": "Not found", "source": "primary (read-your-writes)"}
+
+    replica_idx = pick_replica()
     replica = replicas[replica_idx]
-    stats["replica_reads"][replica_idx] += 1
+    replica_reads[replica_idx] += 1
 
-    await asyncio.sleep(0.03)  # Slightly faster than primary (30ms)
+    replica_inflight[replica_idx] += 1
+    try:
+        await asyncio.sleep(0.03)  # Slightly faster than primary (30ms)
+    finally:
+        replica_inflight[replica_idx] -= 1
 
     if req.key in replica:
         return {
             "data": replica[req.key],
             "latency_ms": 30,
             "source": f"replica-{replica_idx}",
-            "stats": stats.copy(),
         }
     return {"error": "Not found", "source": f"replica-{replica_idx}"}
 
@@ -153,16 +188,26 @@ async def write_to_primary(req: ReadRequest, value: dict):
     # Write to primary
     await asyncio.sleep(0.05)  # Primary write latency
     database[req.key] = value
-
-    # Async replication to replicas (with lag)
-    async def replicate(replica_idx: int, delay: float):
-        await asyncio.sleep(delay)
-        replicas[replica_idx][req.key] = value.copy()
+    database_json[req.key] = orjson.dumps(value)
+    written_at = last_write[req.key] = time.monotonic()
+
+    # Async replication to replicas (with lag): one task walks the replicas in
+    # order of lag, sleeping only the gap until the next one is due
+    async def replicate():
+        # One copy shared by every replica: replica rows are never modified in place,
+        # but the primary's are (see update_versioned)
+        replicated = value.copy()
+        elapsed = 0.0
+        for replica_idx, delay in enumerate(REPLICATION_DELAYS):
+            await asyncio.sleep(delay - elapsed)
+            elapsed = delay
+            replicas[replica_idx][req.key] = replicated
+        # Every replica has the write now; drop the marker unless a newer write replaced it
+        if last_write.get(req.key) == written_at:
+            del last_write[req.key]
 
     # Replicas get data at different times (replication lag)
-    asyncio.create_task(replicate(0, 0.1))  # 100ms lag
-    asyncio.create_task(replicate(1, 0.2))  # 200ms lag
-    asyncio.create_task(replicate(2, 0.3))  # 300ms lag
+    asyncio.create_task(replicate())
 
     return {
         "status": "written",
@@ -173,10 +218,29 @@ async def write_to_primary(req: ReadRequest, value: dict):
 
 # ============ Cache Stampede Demo ============
 
+# Entries are {"data", "expires_at", "delta"}; delta is how long the rebuild took
 stampede_cache: dict[str, dict] = {}
-stampede_locks: dict[str, asyncio.Lock] = {}
+stampede_inflight: dict[str, asyncio.Future] = {}
+# Early refreshes running in the background; held here so they aren't garbage collected
+stampede_refreshes: set[asyncio.Task] = set()
 stampede_stats = {"concurrent_rebuilds": 0, "max_concurrent": 0, "total_rebuilds": 0}
 
+STAMPEDE_TTL_SECONDS = 30
+# Higher beta refreshes earlier (XFetch); 1.0 is the paper's default
+XFETCH_BETA = 1.0
+
+
+def stampede_entry(data: dict, rebuild_started: float) -> dict:
+    """Build a stampede cache entry from a rebuild that started at rebuild_started."""
+    now = time.monotonic()
+    return {"data": data, "expires_at": now + STAMPEDE_TTL_SECONDS, "delta": now - rebuild_started}
+
+
+def xfetch_due(entry: dict, now: float) -> bool:
+    """Probabilistic early expiration: the closer to expiry, the likelier a refresh is due."""
+    # 1 - random() is in (0, 1], so the log is defined and never positive
+    return now - entry["delta"] * XFETCH_BETA * math.log(1.0 - random.random()) >= entry["expires_at"]
+
 
 @router.post("/stampede/expire")
 async def expire_stampede_cache():
@@ -191,8 +255,9 @@ async def expire_stampede_cache():
 @router.post("/stampede/read-naive")
 async def read_stampede_naive(req: ReadRequest):
     """Read without stampede protection - all misses hit DB."""
-    if req.key in stampede_cache:
-        return {"data": stampede_cache[req.key], "source": "cache", "rebuilt": False}
+    entry = stampede_cache.get(req.key)
+    if entry is not None and time.monotonic() < entry["expires_at"]:
+        return {"data": entry["data"], "source": "cache", "rebuilt": False}
 
     # Cache miss - everyone hits the database
     stampede_stats["concurrent_rebuilds"] += 1
@@ -200,54 +265,72 @@ async def read_stampede_naive(req: ReadRequest):
         stampede_stats["max_concurrent"], stampede_stats["concurrent_rebuilds"]
     )
     stampede_stats["total_rebuilds"] += 1
+    rebuild_started = time.monotonic()
 
     await asyncio.sleep(0.2)  # Expensive rebuild (200ms)
 
     stampede_stats["concurrent_rebuilds"] -= 1
 
     if req.key in database:
-        stampede_cache[req.key] = database[req.key].copy()
+        stampede_cache[req.key] = stampede_entry(database[req.key].copy(), rebuild_started)
         return {
             "data": database[req.key],
             "source": "database",
             "rebuilt": True,
-            "stats": stampede_stats.copy(),
         }
     return {"error": "Not found"}
 
 
-@router.post("/stampede/read-protected")
-async def read_stampede_protected(req: ReadRequest):
-    """Read with lock-based stampede protection."""
-    if req.key in stampede_cache:
-        return {"data": stampede_cache[req.key], "source": "cache", "rebuilt": False}
-
-    # Get or create lock for this key
-    if req.key not in stampede_locks:
-        stampede_locks[req.key] = asyncio.Lock()
-
-    async with stampede_locks[req.key]:
-        # Double-check after acquiring lock
-        if req.key in stampede_cache:
-            return {
-                "data": stampede_cache[req.key],
-                "source": "cache (after lock)",
-                "rebuilt": False,
-            }
-
-        # Only one request rebuilds
+async def rebuild_stampede_entry(key: str, future: asyncio.Future) -> dict | None:
+    """Rebuild a cache entry and hand the result to everyone awaiting future."""
+    try:
         stampede_stats["total_rebuilds"] += 1
+        rebuild_started = time.monotonic()
         await asyncio.sleep(0.2)  # Expensive rebuild
 
-        if req.key in database:
-            stampede_cache[req.key] = database[req.key].copy()
-            return {
-                "data": database[req.key],
-                "source": "database",
-                "rebuilt": True,
-                "stats": stampede_stats.copy(),
-            }
-    return {"error": "Not found"}
+        data = None
+        row = database.get(key)
+        if row is not None:
+            data = row.copy()
+            stampede_cache[key] = stampede_entry(data, rebuild_started)
+        future.set_result(data)
+    finally:
+        del stampede_inflight[key]
+        if not future.done():
+            future.cancel()
+    return data
+
+
+@router.post("/stampede/read-protected")
+async def read_stampede_protected(req: ReadRequest):
+    """Read with request coalescing and early refresh - concurrent misses share one rebuild."""
+    entry = stampede_cache.get(req.key)
+    if entry is not None and time.monotonic() < entry["expires_at"]:
+        # Near expiry one reader is picked to start a rebuild in the background; it and
+        # everyone else keep getting the entry, so there's no cliff when it actually expires
+        if req.key not in stampede_inflight and xfetch_due(entry, time.monotonic()):
+            future = asyncio.get_running_loop().create_future()
+            stampede_inflight[req.key] = future
+            refresh = asyncio.create_task(rebuild_stampede_entry(req.key, future))
+            stampede_refreshes.add(refresh)
+            refresh.add_done_callback(stampede_refreshes.discard)
+        return {"data": entry["data"], "source": "cache", "rebuilt": False}
+
+    # A rebuild is already running; wait for its result instead of starting another
+    future = stampede_inflight.get(req.key)
+    if future is not None:
+        data = await future
+        if data is None:
+            return {"error": "Not found"}
+        return {"data": data, "source": "cache (coalesced)", "rebuilt": False}
+
+    # Only one request rebuilds; everyone who arrives meanwhile awaits its future
+    future = asyncio.get_running_loop().create_future()
+    stampede_inflight[req.key] = future
+    data = await rebuild_stampede_entry(req.key, future)
+    if data is None:
+        return {"error": "Not found"}
+    return {"data": data, "source": "database", "rebuilt": True}
 
 
 # ============ Cache Versioning Demo ============
@@ -278,14 +361,28 @@ async def read_versioned(req: ReadRequest):
             "cache_key": versioned_key,
         }
 
-    # Cache miss
-    await asyncio.sleep(0.05)
-    if req.key in database:
-        data = database[req.key].copy()
+    # Cache miss - the version pins the row we need, so any replica that has it will do
+    replica_idx = pick_replica()
+    replica_inflight[replica_idx] += 1
+    try:
+        await asyncio.sleep(0.03)  # Replica latency
+    finally:
+        replica_inflight[replica_idx] -= 1
+    row = replicas[replica_idx].get(req.key)
+    source = f"replica-{replica_idx}"
+
+    if row is None or row.get("version") != version:
+        # Replica hasn't caught up to this version yet; fall back to the primary
+        await asyncio.sleep(0.05)
+        row = database.get(req.key)
+        source = "database"
+
+    if row is not None:
+        data = row.copy()
         versioned_cache[versioned_key] = data
         return {
             "data": data,
-            "source": "database",
+            "source": source,
             "version": version,
             "cache_key": versioned_key,
         }
@@ -301,6 +398,7 @@ async def update_versioned(req: UpdateRequest):
     # Update database
     database[req.key]["price"] = req.price
     database[req.key]["version"] += 1
+    database_json[req.key] = orjson.dumps(database[req.key])
 
     # Increment version (old cache entries become unreachable)
     old_version = cache_versions[req.key]
@@ -320,7 +418,7 @@ async def get_versioned_cache_state():
     """Get current state of versioned cache."""
     return {
         "cache_entries": list(versioned_cache.keys()),
-        "versions": {k: v for k, v in list(cache_versions.items())[:10]},
+        "versions": dict(islice(cache_versions.items(), 10)),
     }
 
 
@@ -331,7 +429,7 @@ async def get_versioned_cache_state():
 async def get_stats():
     """Get current stats."""
     return {
-        "general": stats.copy(),
+        "general": {**stats, "replica_reads": list(replica_reads)},
         "stampede": stampede_stats.copy(),
         "cache_size": len(cache),
         "versioned_cache_size": len(versioned_cache),
@@ -343,8 +441,8 @@ async def reset_all():
     """Reset all state."""
     cache.clear()
     stampede_cache.clear()
-    stampede_locks.clear()
     versioned_cache.clear()
+    last_write.clear()
     reset_stats()
     stampede_stats["concurrent_rebuilds"] = 0
     stampede_stats["max_concurrent"] = 0
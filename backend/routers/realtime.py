@@ -2,6 +2,7 @@ import asyncio
 import random
 from datetime import datetime
 
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 
@@ -14,10 +15,10 @@ async def sse():
 
     async def event_generator():
         for i in range(10):
-            timestamp = datetime.now().isoformat()
-            yield f"data: {{\"count\": {i + 1}, \"timestamp\": \"{timestamp}\"}}\n\n"
+            payload = orjson.dumps({"count": i + 1, "timestamp": datetime.now()})
+            yield b"data: " + payload + b"\n\n"
             await asyncio.sleep(1)
-        yield "data: {\"done\": true}\n\n"
+        yield b'data: {"done":true}\n\n'
 
     return StreamingResponse(
         event_generator(),
@@ -35,10 +36,10 @@ async def websocket_endpoint(websocket: WebSocket):
         try:
             while True:
                 await asyncio.sleep(3)
-                await websocket.send_json({
+                await websocket.send_text(orjson.dumps({
                     "type": "ping",
-                    "timestamp": datetime.now().isoformat()
-                })
+                    "timestamp": datetime.now()
+                }).decode())
         except Exception:
             pass
 
@@ -47,11 +48,13 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            await websocket.send_json({
+            # Text frames, since the client parses event.data as a string. orjson
+            # formats the datetime itself, matching isoformat()
+            await websocket.send_text(orjson.dumps({
                 "type": "echo",
                 "message": data,
-                "timestamp": datetime.now().isoformat()
-            })
+                "timestamp": datetime.now()
+            }).decode())
     except WebSocketDisconnect:
         ping_task.cancel()
 
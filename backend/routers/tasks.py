@@ -2,7 +2,7 @@ import asyncio
 import time
 import uuid
 import random
-from collections import deque
+from dataclasses import dataclass, field
 from enum import Enum
 from fastapi import APIRouter
 from pydantic import BaseModel
@@ -19,12 +19,33 @@ class JobStatus(str, Enum):
     DEAD = "dead"  # Moved to DLQ
 
 
+@dataclass(slots=True)
+class Job:
+    id: str
+    duration: float
+    name: str | None = None
+    status: JobStatus = JobStatus.PENDING
+    force_fail: bool = False
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    completed_at: float | None = None
+    result: str | None = None
+    retries: int = 0
+    error: str | None = None
+    worker: str | None = None
+
+
 # Job storage
-jobs: dict[str, dict] = {}
-# Main job queue (simulated)
-job_queue: deque = deque()
-# Dead letter queue
-dead_letter_queue: deque = deque()
+jobs: dict[str, Job] = {}
+# Number of jobs in each status, kept in step with every transition
+status_counts: dict[JobStatus, int] = {status: 0 for status in JobStatus}
+# Completed job IDs, oldest first; the only jobs trimmed once history is full
+completed_job_ids: dict[str, None] = {}
+# Main job queue; idle workers block on get() so a submit wakes one immediately.
+# Unbounded on purpose: backpressure is checked on submit, retries always get back in.
+job_queue: asyncio.Queue[str] = asyncio.Queue()
+# Dead letter queue; a dict keeps arrival order with O(1) membership and removal
+dead_letter_queue: dict[str, None] = {}
 # Worker state
 workers: dict[str, dict] = {}
 # Processing stats
@@ -39,14 +60,33 @@ stats = {
 
 # Config
 MAX_QUEUE_SIZE = 10
+MAX_JOB_HISTORY = 10_000
 MAX_RETRIES = 3
 WORKER_COUNT = 3
 
-# Background worker task
-worker_task = None
+# One long-lived task per worker
+worker_tasks: list[asyncio.Task] = []
 workers_running = False
 
 
+def set_status(job: Job, status: JobStatus):
+    """Move a job to a new status and update status_counts."""
+    status_counts[job.status] -= 1
+    status_counts[status] += 1
+    job.status = status
+
+
+def add_job(job: Job):
+    """Store a new pending job, dropping the oldest completed jobs if history is full."""
+    while len(jobs) >= MAX_JOB_HISTORY and completed_job_ids:
+        oldest_id = next(iter(completed_job_ids))
+        del completed_job_ids[oldest_id]
+        status_counts[jobs.pop(oldest_id).status] -= 1
+    
+    jobs[job.id] = job
+    status_counts[job.status] += 1
+
+
 # ============ 1. Sync vs Async Demo ============
 
 class SyncJobRequest(BaseModel):
@@ -56,12 +96,12 @@ class SyncJobRequest(BaseModel):
 @router.post("/sync/process")
 async def sync_process(req: SyncJobRequest):
     """Synchronous processing - blocks until complete."""
-    start = time.time()
+    start = time.monotonic_ns()
     
     # Simulate heavy work (blocking)
     await asyncio.sleep(req.duration_seconds)
     
-    elapsed = time.time() - start
+    elapsed = (time.monotonic_ns() - start) / 1_000_000_000
     return {
         "status": "completed",
         "processing_time_ms": round(elapsed * 1000, 2),
@@ -75,24 +115,15 @@ async def async_submit(req: SyncJobRequest):
     """Async processing - returns immediately with job ID."""
     job_id = str(uuid.uuid4())[:8]
     
-    jobs[job_id] = {
-        "id": job_id,
-        "status": JobStatus.PENDING,
-        "duration": req.duration_seconds,
-        "created_at": time.time(),
-        "started_at": None,
-        "completed_at": None,
-        "result": None,
-        "retries": 0,
-    }
+    add_job(Job(id=job_id, duration=req.duration_seconds))
     
-    job_queue.append(job_id)
+    job_queue.put_nowait(job_id)
     stats["jobs_submitted"] += 1
     
     return {
         "status": "accepted",
         "job_id": job_id,
-        "queue_position": len(job_queue),
+        "queue_position": job_queue.qsize(),
         "message": "Job queued for processing",
         "note": "User gets immediate response!",
     }
@@ -107,18 +138,18 @@ async def async_status(job_id: str):
     job = jobs[job_id]
     response = {
         "job_id": job_id,
-        "status": job["status"],
-        "created_at": job["created_at"],
+        "status": job.status,
+        "created_at": job.created_at,
     }
     
-    if job["started_at"]:
-        response["started_at"] = job["started_at"]
-        response["wait_time_ms"] = round((job["started_at"] - job["created_at"]) * 1000, 2)
+    if job.started_at:
+        response["started_at"] = job.started_at
+        response["wait_time_ms"] = round((job.started_at - job.created_at) * 1000, 2)
     
-    if job["completed_at"]:
-        response["completed_at"] = job["completed_at"]
-        response["processing_time_ms"] = round((job["completed_at"] - job["started_at"]) * 1000, 2)
-        response["result"] = job["result"]
+    if job.completed_at:
+        response["completed_at"] = job.completed_at
+        response["processing_time_ms"] = round((job.completed_at - job.started_at) * 1000, 2)
+        response["result"] = job.result
     
     return response
 
@@ -128,7 +159,7 @@ async def async_status(job_id: str):
 @router.post("/workers/start")
 async def start_workers():
     """Start the worker pool."""
-    global workers_running, worker_task
+    global workers_running, worker_tasks
     
     if workers_running:
         return {"status": "already_running", "worker_count": WORKER_COUNT}
@@ -146,7 +177,7 @@ async def start_workers():
         }
     
     # Start background processing
-    worker_task = asyncio.create_task(run_workers())
+    worker_tasks = [asyncio.create_task(run_worker(worker_id)) for worker_id in workers]
     
     return {
         "status": "started",
@@ -155,18 +186,21 @@ async def start_workers():
     }
 
 
+async def cancel_workers():
+    """Cancel the worker tasks and wait for them to exit."""
+    global workers_running, worker_tasks
+    
+    workers_running = False
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    worker_tasks = []
+
+
 @router.post("/workers/stop")
 async def stop_workers():
     """Stop the worker pool."""
-    global workers_running, worker_task
-    
-    workers_running = False
-    if worker_task:
-        worker_task.cancel()
-        try:
-            await worker_task
-        except asyncio.CancelledError:
-            pass
+    await cancel_workers()
     
     # Mark all workers as stopped
     for w in workers.values():
@@ -175,29 +209,24 @@ async def stop_workers():
     return {"status": "stopped"}
 
 
-async def run_workers():
-    """Background task that processes jobs."""
-    global workers_running
+async def run_worker(worker_id: str):
+    """Background task for one worker: take the next job as soon as one is queued."""
+    worker = workers[worker_id]
     
     while workers_running:
-        # Find idle workers and assign jobs
-        for worker_id, worker in workers.items():
-            if worker["status"] == "idle" and job_queue:
-                job_id = job_queue.popleft()
-                if job_id in jobs:
-                    job = jobs[job_id]
-                    if job["status"] == JobStatus.PENDING:
-                        # Assign job to worker
-                        worker["status"] = "processing"
-                        worker["current_job"] = job_id
-                        job["status"] = JobStatus.PROCESSING
-                        job["started_at"] = time.time()
-                        job["worker"] = worker_id
-                        
-                        # Process in background
-                        asyncio.create_task(process_job(worker_id, job_id))
+        job_id = await job_queue.get()
+        job = jobs.get(job_id)
+        if job is None or job.status != JobStatus.PENDING:
+            continue
         
-        await asyncio.sleep(0.1)
+        # Assign job to worker
+        worker["status"] = "processing"
+        worker["current_job"] = job_id
+        set_status(job, JobStatus.PROCESSING)
+        job.started_at = time.time()
+        job.worker = worker_id
+        
+        await process_job(worker_id, job_id)
 
 
 async def process_job(worker_id: str, job_id: str):
@@ -210,39 +239,48 @@ async def process_job(worker_id: str, job_id: str):
     
     try:
         # Simulate processing
-        await asyncio.sleep(job["duration"])
+        await asyncio.sleep(job.duration)
         
         # Random failure for demo (20% chance)
-        if job.get("force_fail") or (random.random() < 0.2 and job["retries"] < MAX_RETRIES):
+        if job.force_fail or (random.random() < 0.2 and job.retries < MAX_RETRIES):
             raise Exception("Random processing error")
         
         # Success
-        job["status"] = JobStatus.COMPLETED
-        job["completed_at"] = time.time()
-        job["result"] = f"Processed by {worker_id}"
+        set_status(job, JobStatus.COMPLETED)
+        completed_job_ids[job_id] = None
+        job.completed_at = time.time()
+        job.result = f"Processed by {worker_id}"
         stats["jobs_completed"] += 1
-        stats["total_processing_time"] += job["duration"]
+        stats["total_processing_time"] += job.duration
+        worker["jobs_processed"] += 1
         
     except Exception as e:
-        job["retries"] += 1
+        job.retries += 1
+        worker["jobs_processed"] += 1
         
-        if job["retries"] >= MAX_RETRIES:
+        if job.retries >= MAX_RETRIES:
             # Move to DLQ
-            job["status"] = JobStatus.DEAD
-            job["error"] = str(e)
-            dead_letter_queue.append(job_id)
+            set_status(job, JobStatus.DEAD)
+            job.error = str(e)
+            dead_letter_queue[job_id] = None
             stats["jobs_in_dlq"] += 1
         else:
             # Retry - put back in queue
-            job["status"] = JobStatus.PENDING
-            job["started_at"] = None
-            job_queue.append(job_id)
+            set_status(job, JobStatus.PENDING)
+            job.started_at = None
+            job_queue.put_nowait(job_id)
             stats["jobs_failed"] += 1
     
+    except asyncio.CancelledError:
+        # Workers were stopped mid-job; hand it back so it runs after a restart
+        set_status(job, JobStatus.PENDING)
+        job.started_at = None
+        job_queue.put_nowait(job_id)
+        raise
+    
     finally:
         worker["status"] = "idle"
         worker["current_job"] = None
-        worker["jobs_processed"] += 1
 
 
 @router.get("/workers/status")
@@ -251,7 +289,7 @@ async def workers_status():
     return {
         "running": workers_running,
         "workers": list(workers.values()),
-        "queue_depth": len(job_queue),
+        "queue_depth": job_queue.qsize(),
         "dlq_depth": len(dead_letter_queue),
         "stats": stats.copy(),
     }
@@ -269,40 +307,28 @@ class JobRequest(BaseModel):
 async def submit_job(req: JobRequest):
     """Submit a job to the queue."""
     # Check backpressure
-    if len(job_queue) >= MAX_QUEUE_SIZE:
+    if job_queue.qsize() >= MAX_QUEUE_SIZE:
         stats["queue_rejections"] += 1
         return {
             "status": "rejected",
             "reason": "queue_full",
-            "queue_depth": len(job_queue),
+            "queue_depth": job_queue.qsize(),
             "max_queue_size": MAX_QUEUE_SIZE,
             "message": "System busy - try again later",
         }
     
     job_id = str(uuid.uuid4())[:8]
     
-    jobs[job_id] = {
-        "id": job_id,
-        "name": req.name,
-        "status": JobStatus.PENDING,
-        "duration": req.duration,
-        "force_fail": req.force_fail,
-        "created_at": time.time(),
-        "started_at": None,
-        "completed_at": None,
-        "result": None,
-        "retries": 0,
-        "error": None,
-    }
+    add_job(Job(id=job_id, name=req.name, duration=req.duration, force_fail=req.force_fail))
     
-    job_queue.append(job_id)
+    job_queue.put_nowait(job_id)
     stats["jobs_submitted"] += 1
     
     return {
         "status": "queued",
         "job_id": job_id,
         "name": req.name,
-        "queue_position": len(job_queue),
+        "queue_position": job_queue.qsize(),
     }
 
 
@@ -312,34 +338,22 @@ async def submit_burst(count: int = 15):
     results = {"queued": 0, "rejected": 0, "job_ids": []}
     
     for i in range(count):
-        if len(job_queue) >= MAX_QUEUE_SIZE:
+        if job_queue.qsize() >= MAX_QUEUE_SIZE:
             stats["queue_rejections"] += 1
             results["rejected"] += 1
             continue
         
         job_id = str(uuid.uuid4())[:8]
-        jobs[job_id] = {
-            "id": job_id,
-            "name": f"burst-job-{i}",
-            "status": JobStatus.PENDING,
-            "duration": random.uniform(0.5, 2.0),
-            "force_fail": False,
-            "created_at": time.time(),
-            "started_at": None,
-            "completed_at": None,
-            "result": None,
-            "retries": 0,
-            "error": None,
-        }
+        add_job(Job(id=job_id, name=f"burst-job-{i}", duration=random.uniform(0.5, 2.0)))
         
-        job_queue.append(job_id)
+        job_queue.put_nowait(job_id)
         stats["jobs_submitted"] += 1
         results["queued"] += 1
         results["job_ids"].append(job_id)
     
     return {
         **results,
-        "queue_depth": len(job_queue),
+        "queue_depth": job_queue.qsize(),
         "max_queue_size": MAX_QUEUE_SIZE,
         "message": f"Queued {results['queued']}, rejected {results['rejected']} (backpressure)",
     }
@@ -348,18 +362,13 @@ async def submit_burst(count: int = 15):
 @router.get("/queue/status")
 async def queue_status():
     """Get queue status."""
-    pending_jobs = [j for j in jobs.values() if j["status"] == JobStatus.PENDING]
-    processing_jobs = [j for j in jobs.values() if j["status"] == JobStatus.PROCESSING]
-    completed_jobs = [j for j in jobs.values() if j["status"] == JobStatus.COMPLETED]
-    failed_jobs = [j for j in jobs.values() if j["status"] == JobStatus.DEAD]
-    
     return {
-        "queue_depth": len(job_queue),
+        "queue_depth": job_queue.qsize(),
         "max_queue_size": MAX_QUEUE_SIZE,
-        "pending": len(pending_jobs),
-        "processing": len(processing_jobs),
-        "completed": len(completed_jobs),
-        "in_dlq": len(failed_jobs),
+        "pending": status_counts[JobStatus.PENDING],
+        "processing": status_counts[JobStatus.PROCESSING],
+        "completed": status_counts[JobStatus.COMPLETED],
+        "in_dlq": status_counts[JobStatus.DEAD],
         "stats": stats.copy(),
     }
 
@@ -371,21 +380,9 @@ async def submit_failing_job():
     """Submit a job that will always fail (for DLQ demo)."""
     job_id = str(uuid.uuid4())[:8]
     
-    jobs[job_id] = {
-        "id": job_id,
-        "name": "failing-job",
-        "status": JobStatus.PENDING,
-        "duration": 0.5,
-        "force_fail": True,
-        "created_at": time.time(),
-        "started_at": None,
-        "completed_at": None,
-        "result": None,
-        "retries": 0,
-        "error": None,
-    }
+    add_job(Job(id=job_id, name="failing-job", duration=0.5, force_fail=True))
     
-    job_queue.append(job_id)
+    job_queue.put_nowait(job_id)
     stats["jobs_submitted"] += 1
     
     return {
@@ -415,21 +412,21 @@ async def retry_dlq_job(job_id: str):
         return {"error": "Job not found"}
     
     job = jobs[job_id]
-    if job["status"] != JobStatus.DEAD:
+    if job.status != JobStatus.DEAD:
         return {"error": "Job is not in DLQ"}
     
     # Reset job for retry
-    job["status"] = JobStatus.PENDING
-    job["retries"] = 0
-    job["force_fail"] = False  # Give it a chance this time
-    job["error"] = None
+    set_status(job, JobStatus.PENDING)
+    job.retries = 0
+    job.force_fail = False  # Give it a chance this time
+    job.error = None
     
     # Remove from DLQ and add to main queue
     if job_id in dead_letter_queue:
-        dead_letter_queue.remove(job_id)
+        del dead_letter_queue[job_id]
         stats["jobs_in_dlq"] -= 1
     
-    job_queue.append(job_id)
+    job_queue.put_nowait(job_id)
     
     return {
         "status": "requeued",
@@ -455,7 +452,7 @@ async def get_stats():
     """Get overall stats."""
     return {
         "stats": stats.copy(),
-        "queue_depth": len(job_queue),
+        "queue_depth": job_queue.qsize(),
         "dlq_depth": len(dead_letter_queue),
         "total_jobs": len(jobs),
         "workers_running": workers_running,
@@ -466,20 +463,16 @@ async def get_stats():
 @router.post("/reset")
 async def reset_all():
     """Reset all state."""
-    global workers_running, worker_task
-    
     # Stop workers
-    workers_running = False
-    if worker_task:
-        worker_task.cancel()
-        try:
-            await worker_task
-        except asyncio.CancelledError:
-            pass
+    await cancel_workers()
     
     # Clear all state
     jobs.clear()
-    job_queue.clear()
+    completed_job_ids.clear()
+    for status in status_counts:
+        status_counts[status] = 0
+    while not job_queue.empty():
+        job_queue.get_nowait()
     dead_letter_queue.clear()
     workers.clear()
     
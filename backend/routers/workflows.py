@@ -1,16 +1,43 @@
 import asyncio
+import logging
+import os
+import queue
+import secrets
+import threading
 import time
-import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
 from enum import Enum
-from fastapi import APIRouter
+from itertools import accumulate
+
+import orjson
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
-router = APIRouter(prefix="/api/workflows", tags=["workflows"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Restore durable workflows from their log and keep appending to it for the app's lifetime."""
+    if DURABLE_LOG_PATH:
+        load_durable_log()
+        start_durable_log_writer()
+    yield
+    await asyncio.to_thread(stop_durable_log_writer)
+
+
+router = APIRouter(prefix="/api/workflows", tags=["workflows"], lifespan=lifespan)
+
+# Multiplier for the simulated step durations; WF_LATENCY=0 skips the sleeps (e.g. for load tests)
+LATENCY_SCALE = float(os.getenv("WF_LATENCY", "1.0"))
 
 # In-memory storage for workflow state
 workflows: dict[str, dict] = {}
 event_logs: dict[str, list] = {}
 
+# One lock per saga/durable workflow so overlapping step requests can't run the same step twice
+workflow_locks: dict[str, asyncio.Lock] = {}
+
 
 class StepStatus(str, Enum):
     PENDING = "pending"
@@ -32,6 +59,11 @@ class WorkflowStatus(str, Enum):
 
 # ============ Saga Pattern Demo ============
 
+def log_event(logs: list, now: float, event: str, type_: str):
+    """Append an entry to a saga's event log; callers share one `now` per burst of events."""
+    logs.append({"timestamp": now, "event": event, "type": type_})
+
+
 SAGA_STEPS = [
     {"name": "Reserve Inventory", "compensation": "Release Inventory", "duration": 0.8},
     {"name": "Charge Payment", "compensation": "Refund Payment", "duration": 1.0},
@@ -47,7 +79,7 @@ class SagaRequest(BaseModel):
 @router.post("/saga/start")
 async def start_saga(request: SagaRequest):
     """Start a new saga workflow."""
-    workflow_id = str(uuid.uuid4())[:8]
+    workflow_id = secrets.token_hex(4)
 
     workflows[workflow_id] = {
         "id": workflow_id,
@@ -55,17 +87,14 @@ async def start_saga(request: SagaRequest):
         "status": WorkflowStatus.RUNNING,
         "fail_at_step": request.fail_at_step,
         "current_step": 0,
-        "steps": [
-            {
-                "name": step["name"],
-                "compensation": step["compensation"],
-                "status": StepStatus.PENDING,
-            }
-            for step in SAGA_STEPS
-        ],
+        # Indexes of completed steps, newest last; rollback compensates from the top
+        "completed_stack": [],
+        # Status of each SAGA_STEPS entry; names come from the shared template
+        "step_status": [StepStatus.PENDING] * len(SAGA_STEPS),
         "created_at": time.time(),
     }
     event_logs[workflow_id] = []
+    workflow_locks[workflow_id] = asyncio.Lock()
 
     return {"workflow_id": workflow_id, "status": "started"}
 
@@ -73,132 +102,165 @@ async def start_saga(request: SagaRequest):
 @router.post("/saga/{workflow_id}/step")
 async def execute_saga_step(workflow_id: str):
     """Execute the next step in the saga."""
-    if workflow_id not in workflows:
+    wf = workflows.get(workflow_id)
+    if wf is None:
         return {"error": "Workflow not found"}
 
-    wf = workflows[workflow_id]
-    logs = event_logs[workflow_id]
+    async with workflow_locks[workflow_id]:
+        return await advance_saga(wf, event_logs[workflow_id])
+
 
-    if wf["status"] == WorkflowStatus.COMPLETED:
+async def advance_saga(wf: dict, logs: list):
+    """Run (or compensate) the saga's next step; the caller holds the workflow's lock."""
+    # Statuses are always stored as the enum members, so identity checks suffice
+    status = wf["status"]
+    if status is WorkflowStatus.COMPLETED:
         return {"status": "already_completed"}
 
-    if wf["status"] == WorkflowStatus.ROLLED_BACK:
+    if status is WorkflowStatus.ROLLED_BACK:
         return {"status": "already_rolled_back"}
 
     # Handle rollback mode
-    if wf["status"] == WorkflowStatus.ROLLING_BACK:
-        # Find the next step to compensate (going backwards)
-        for i in range(len(wf["steps"]) - 1, -1, -1):
-            step = wf["steps"][i]
-            if step["status"] == StepStatus.COMPLETED:
-                step["status"] = StepStatus.COMPENSATING
-                logs.append({
-                    "timestamp": time.time(),
-                    "event": f"Compensating: {step['compensation']}",
-                    "type": "compensate",
-                })
-
-                await asyncio.sleep(0.5)
-
-                step["status"] = StepStatus.COMPENSATED
-                logs.append({
-                    "timestamp": time.time(),
-                    "event": f"Compensated: {step['compensation']}",
-                    "type": "compensated",
-                })
-
-                # Check if all compensations done
-                all_compensated = all(
-                    s["status"] in [StepStatus.COMPENSATED, StepStatus.PENDING, StepStatus.FAILED]
-                    for s in wf["steps"]
-                )
-                if all_compensated:
-                    wf["status"] = WorkflowStatus.ROLLED_BACK
-                    logs.append({
-                        "timestamp": time.time(),
-                        "event": "Saga rolled back completely",
-                        "type": "rollback_complete",
-                    })
-
-                return {"status": "compensating", "step": step["compensation"]}
-
-        return {"status": "rollback_complete"}
+    if status is WorkflowStatus.ROLLING_BACK:
+        # Compensate the most recently completed step
+        stack = wf["completed_stack"]
+        if not stack:
+            # Failed on the first step, so there was nothing to undo
+            wf["status"] = WorkflowStatus.ROLLED_BACK
+            log_event(logs, time.time(), "Saga rolled back completely", "rollback_complete")
+            return {"status": "rollback_complete"}
+
+        index = stack[-1]
+        step = SAGA_STEPS[index]
+        wf["step_status"][index] = StepStatus.COMPENSATING
+        log_event(logs, time.time(), f"Compensating: {step['compensation']}", "compensate")
+
+        if LATENCY_SCALE:
+            await asyncio.sleep(0.5 * LATENCY_SCALE)
+
+        stack.pop()
+        wf["step_status"][index] = StepStatus.COMPENSATED
+        now = time.time()
+        log_event(logs, now, f"Compensated: {step['compensation']}", "compensated")
+
+        if not stack:
+            wf["status"] = WorkflowStatus.ROLLED_BACK
+            log_event(logs, now, "Saga rolled back completely", "rollback_complete")
+
+        return {"status": "compensating", "step": step["compensation"]}
 
     # Normal execution mode
     current = wf["current_step"]
-    if current >= len(wf["steps"]):
+    if current >= len(SAGA_STEPS):
         wf["status"] = WorkflowStatus.COMPLETED
         return {"status": "completed"}
 
-    step = wf["steps"][current]
-    step["status"] = StepStatus.RUNNING
+    step = SAGA_STEPS[current]
+    wf["step_status"][current] = StepStatus.RUNNING
 
-    logs.append({
-        "timestamp": time.time(),
-        "event": f"Executing: {step['name']}",
-        "type": "start",
-    })
+    log_event(logs, time.time(), f"Executing: {step['name']}", "start")
 
     # Simulate work
-    await asyncio.sleep(SAGA_STEPS[current]["duration"])
+    if LATENCY_SCALE:
+        await asyncio.sleep(step["duration"] * LATENCY_SCALE)
+
+    now = time.time()
 
     # Check if this step should fail
     if wf["fail_at_step"] == current:
-        step["status"] = StepStatus.FAILED
+        wf["step_status"][current] = StepStatus.FAILED
         wf["status"] = WorkflowStatus.ROLLING_BACK
 
-        logs.append({
-            "timestamp": time.time(),
-            "event": f"FAILED: {step['name']}",
-            "type": "error",
-        })
-        logs.append({
-            "timestamp": time.time(),
-            "event": "Starting compensation...",
-            "type": "rollback_start",
-        })
+        log_event(logs, now, f"FAILED: {step['name']}", "error")
+        log_event(logs, now, "Starting compensation...", "rollback_start")
 
         return {"status": "failed", "step": step["name"], "rolling_back": True}
 
-    step["status"] = StepStatus.COMPLETED
+    wf["step_status"][current] = StepStatus.COMPLETED
+    wf["completed_stack"].append(current)
     wf["current_step"] = current + 1
 
-    logs.append({
-        "timestamp": time.time(),
-        "event": f"Completed: {step['name']}",
-        "type": "success",
-    })
+    log_event(logs, now, f"Completed: {step['name']}", "success")
 
-    if wf["current_step"] >= len(wf["steps"]):
+    if wf["current_step"] >= len(SAGA_STEPS):
         wf["status"] = WorkflowStatus.COMPLETED
-        logs.append({
-            "timestamp": time.time(),
-            "event": "Saga completed successfully!",
-            "type": "complete",
-        })
+        log_event(logs, now, "Saga completed successfully!", "complete")
 
     return {"status": "step_completed", "step": step["name"]}
 
 
+# Saga statuses and advance_saga results after which another call would change nothing
+SAGA_FINAL_STATUSES = frozenset({WorkflowStatus.COMPLETED, WorkflowStatus.ROLLED_BACK})
+SAGA_FINAL_RESULTS = frozenset({"completed", "already_completed", "already_rolled_back", "rollback_complete"})
+
+
+@router.post("/saga/{workflow_id}/run")
+async def run_saga(workflow_id: str):
+    """Run the saga to completion (or through its full rollback) in one request."""
+    wf = workflows.get(workflow_id)
+    if wf is None:
+        return {"error": "Workflow not found"}
+
+    results = []
+    async with workflow_locks[workflow_id]:
+        logs = event_logs[workflow_id]
+        while wf["status"] not in SAGA_FINAL_STATUSES:
+            result = await advance_saga(wf, logs)
+            results.append(result)
+            if result["status"] in SAGA_FINAL_RESULTS:
+                break
+
+    return {"status": wf["status"], "results": results}
+
+
 @router.get("/saga/{workflow_id}")
 async def get_saga_state(workflow_id: str):
     """Get current state of a saga workflow."""
-    if workflow_id not in workflows:
+    wf = workflows.get(workflow_id)
+    if wf is None:
         return {"error": "Workflow not found"}
 
-    wf = workflows[workflow_id]
     logs = event_logs.get(workflow_id, [])
 
-    return {
-        "workflow": wf,
+    # Expand the per-step statuses against the shared template for the client
+    view = {**wf, "steps": [
+        {"name": step["name"], "compensation": step["compensation"], "status": status}
+        for step, status in zip(SAGA_STEPS, wf["step_status"])
+    ]}
+    del view["step_status"]
+
+    # Returning the response directly skips FastAPI's jsonable_encoder pass over the logs
+    return ORJSONResponse({
+        "workflow": view,
         "logs": logs,
-    }
+    })
 
 
 # ============ Event Sourcing Demo ============
 
+@dataclass(slots=True)
+class Projection:
+    balance: int = 0
+    version: int = 0
+
+    def to_dict(self) -> dict:
+        return {"balance": self.balance, "version": self.version}
+
+
 event_store: dict[str, list] = {}
-projections: dict[str, dict] = {}
+projections: dict[str, Projection] = {}
+
+# How each event type moves the balance; other types leave it unchanged
+BALANCE_SIGN = {"deposit": 1, "withdraw": -1}
+
+# Appends past this many events per aggregate are rejected instead of growing without bound
+MAX_EVENTS_PER_AGGREGATE = 10_000
+# GET /events/{id} returns only the newest events unless asked for more
+EVENTS_PAGE_SIZE = 500
+
+# Every SNAPSHOT_EVERY events the projection is saved so replays only walk the tail
+SNAPSHOT_EVERY = 128
+snapshots: dict[str, Projection] = {}
 
 
 class EventCommand(BaseModel):
@@ -210,81 +272,95 @@ class EventCommand(BaseModel):
 @router.post("/events/append")
 async def append_event(cmd: EventCommand):
     """Append an event to the event store."""
-    if cmd.aggregate_id not in event_store:
-        event_store[cmd.aggregate_id] = []
-        projections[cmd.aggregate_id] = {"balance": 0, "version": 0}
+    events = event_store.get(cmd.aggregate_id)
+    if events is None:
+        events = event_store[cmd.aggregate_id] = []
+        projections[cmd.aggregate_id] = Projection()
+
+    if len(events) >= MAX_EVENTS_PER_AGGREGATE:
+        return {
+            "status": "rejected",
+            "reason": "event_limit",
+            "max_events": MAX_EVENTS_PER_AGGREGATE,
+            "message": "Aggregate has reached its event limit - clear it to continue",
+        }
 
     event = {
-        "id": str(uuid.uuid4())[:8],
+        "id": secrets.token_hex(4),
         "aggregate_id": cmd.aggregate_id,
         "type": cmd.event_type,
         "data": cmd.data,
         "timestamp": time.time(),
-        "version": len(event_store[cmd.aggregate_id]) + 1,
+        "version": len(events) + 1,
     }
 
-    event_store[cmd.aggregate_id].append(event)
+    events.append(event)
 
     # Update projection
     proj = projections[cmd.aggregate_id]
-    if cmd.event_type == "deposit":
-        proj["balance"] += cmd.data.get("amount", 0)
-    elif cmd.event_type == "withdraw":
-        proj["balance"] -= cmd.data.get("amount", 0)
-    proj["version"] = event["version"]
+    # Only deposits and withdrawals move the balance; other events may carry any amount
+    sign = BALANCE_SIGN.get(cmd.event_type)
+    if sign:
+        proj.balance += sign * cmd.data.get("amount", 0)
+    proj.version = event["version"]
 
-    return {"event": event, "projection": proj}
+    if proj.version % SNAPSHOT_EVERY == 0:
+        snapshots[cmd.aggregate_id] = replace(proj)
+
+    return {"event": event, "projection": proj.to_dict()}
 
 
 @router.get("/events/{aggregate_id}")
-async def get_events(aggregate_id: str):
-    """Get all events for an aggregate."""
+async def get_events(aggregate_id: str, limit: int = EVENTS_PAGE_SIZE):
+    """Get the newest events for an aggregate."""
     events = event_store.get(aggregate_id, [])
-    projection = projections.get(aggregate_id, {"balance": 0, "version": 0})
+    projection = projections.get(aggregate_id) or Projection()
 
-    return {
-        "events": events,
-        "projection": projection,
-    }
+    return ORJSONResponse({
+        "events": events[-limit:] if limit > 0 else [],
+        "total_events": len(events),
+        "projection": projection.to_dict(),
+    })
 
 
 @router.post("/events/{aggregate_id}/replay")
 async def replay_events(aggregate_id: str):
     """Replay events to rebuild projection."""
-    events = event_store.get(aggregate_id, [])
-
-    # Reset projection
-    proj = {"balance": 0, "version": 0}
-
-    replay_log = []
-    for event in events:
-        if event["type"] == "deposit":
-            proj["balance"] += event["data"].get("amount", 0)
-        elif event["type"] == "withdraw":
-            proj["balance"] -= event["data"].get("amount", 0)
-        proj["version"] = event["version"]
-
-        replay_log.append({
-            "event": event["type"],
-            "amount": event["data"].get("amount", 0),
-            "balance_after": proj["balance"],
-        })
-
+    # Start from the latest snapshot and only replay the events after it
+    base = snapshots.get(aggregate_id) or Projection()
+    events = event_store.get(aggregate_id, [])[base.version:]
+
+    # Running sum of signed amounts, seeded with the snapshot balance; events outside
+    # BALANCE_SIGN contribute nothing whatever their amount holds
+    amounts = [event["data"].get("amount", 0) for event in events]
+    signs = [BALANCE_SIGN.get(event["type"], 0) for event in events]
+    balances = list(accumulate(
+        (amount * sign if sign else 0 for amount, sign in zip(amounts, signs)),
+        initial=base.balance,
+    ))
+
+    replay_log = [
+        {"event": event["type"], "amount": amount, "balance_after": balance}
+        for event, amount, balance in zip(events, amounts, balances[1:])
+    ]
+
+    proj = Projection(balances[-1], events[-1]["version"] if events else base.version)
     projections[aggregate_id] = proj
 
-    return {
+    # Snapshots keep the replayed tail under SNAPSHOT_EVERY events, so this stays on the loop
+    return ORJSONResponse({
         "replay_log": replay_log,
-        "final_projection": proj,
-    }
+        "snapshot_version": base.version,
+        "final_projection": proj.to_dict(),
+    })
 
 
 @router.delete("/events/{aggregate_id}")
 async def clear_events(aggregate_id: str):
     """Clear events for an aggregate."""
-    if aggregate_id in event_store:
-        del event_store[aggregate_id]
-    if aggregate_id in projections:
-        del projections[aggregate_id]
+    event_store.pop(aggregate_id, None)
+    projections.pop(aggregate_id, None)
+    snapshots.pop(aggregate_id, None)
     return {"status": "cleared"}
 
 
@@ -292,6 +368,105 @@ async def clear_events(aggregate_id: str):
 
 durable_workflows: dict[str, dict] = {}
 
+# Optional append-only JSON-lines log of durable workflow progress, replayed on startup.
+# Off unless WF_DURABLE_LOG names a file; durable workflows are otherwise in memory only.
+DURABLE_LOG_PATH = os.getenv("WF_DURABLE_LOG", "")
+DURABLE_LOG_BATCH_SIZE = 64
+# With WF_LATENCY=0 a step never awaits, so /run yields to the loop every this many steps
+DURABLE_RUN_YIELD_EVERY = 64
+# Encoded records waiting for the writer thread; None tells it to stop
+_durable_log_queue: queue.Queue[bytes | None] = queue.Queue()
+_durable_log_writer: threading.Thread | None = None
+
+
+def persist_durable(record: dict):
+    """Queue a durable workflow record for the log (written asynchronously in batches)."""
+    if DURABLE_LOG_PATH:
+        _durable_log_queue.put(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+
+
+def _write_durable_log(fd: int):
+    """Writer thread: append each batch of queued records with a single write and fsync."""
+    running = True
+    while running:
+        batch = [_durable_log_queue.get()]
+        while len(batch) < DURABLE_LOG_BATCH_SIZE:
+            try:
+                batch.append(_durable_log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            running = False
+        records = [record for record in batch if record is not None]
+
+        try:
+            if records:
+                os.write(fd, b"".join(records))
+                os.fsync(fd)
+        except OSError:
+            logging.getLogger(__name__).exception("Dropped %d durable workflow records", len(records))
+        finally:
+            for _ in batch:
+                _durable_log_queue.task_done()
+    os.close(fd)
+
+
+def start_durable_log_writer():
+    """Start the background thread that persists durable workflow records."""
+    global _durable_log_writer
+    if _durable_log_writer is None:
+        # Opened here rather than in the thread so an unusable path fails at startup
+        fd = os.open(DURABLE_LOG_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        _durable_log_writer = threading.Thread(target=_write_durable_log, args=(fd,), name="durable-log-writer", daemon=True)
+        _durable_log_writer.start()
+
+
+def stop_durable_log_writer():
+    """Flush outstanding records and stop the writer thread."""
+    global _durable_log_writer
+    if _durable_log_writer is not None:
+        _durable_log_queue.put(None)
+        _durable_log_writer.join()
+        _durable_log_writer = None
+
+
+def truncate_durable_log():
+    """Wait for queued records to land, then empty the log."""
+    # A writer that has died will never mark its records done
+    if _durable_log_writer is not None and _durable_log_writer.is_alive():
+        _durable_log_queue.join()
+    if os.path.exists(DURABLE_LOG_PATH):
+        os.truncate(DURABLE_LOG_PATH, 0)
+
+
+def load_durable_log():
+    """Rebuild durable_workflows from the records logged by previous runs."""
+    try:
+        f = open(DURABLE_LOG_PATH, "rb")
+    except FileNotFoundError:
+        return
+
+    with f:
+        for line in f:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # A torn final line from a crash mid-write; everything before it is intact
+                break
+
+            if record["op"] == "start":
+                wf = record["workflow"]
+                durable_workflows[wf["id"]] = wf
+                workflow_locks[wf["id"]] = asyncio.Lock()
+            elif record["op"] == "step":
+                wf = durable_workflows.get(record["id"])
+                if wf is None:
+                    continue
+                wf["history"].append(record["result"])
+                wf["current_step"] += 1
+                if wf["current_step"] >= len(wf["steps"]):
+                    wf["status"] = "completed"
+
 
 class DurableWorkflowRequest(BaseModel):
     steps: list[str]
@@ -300,9 +475,9 @@ class DurableWorkflowRequest(BaseModel):
 @router.post("/durable/start")
 async def start_durable_workflow(request: DurableWorkflowRequest):
     """Start a durable workflow that can survive crashes."""
-    workflow_id = str(uuid.uuid4())[:8]
+    workflow_id = secrets.token_hex(4)
 
-    durable_workflows[workflow_id] = {
+    wf = durable_workflows[workflow_id] = {
         "id": workflow_id,
         "status": "running",
         "steps": request.steps,
@@ -310,6 +485,8 @@ async def start_durable_workflow(request: DurableWorkflowRequest):
         "current_step": 0,
         "created_at": time.time(),
     }
+    workflow_locks[workflow_id] = asyncio.Lock()
+    persist_durable({"op": "start", "workflow": wf})
 
     return {"workflow_id": workflow_id}
 
@@ -317,11 +494,16 @@ async def start_durable_workflow(request: DurableWorkflowRequest):
 @router.post("/durable/{workflow_id}/execute")
 async def execute_durable_step(workflow_id: str, crash_after: bool = False):
     """Execute next step. If crash_after=True, simulate crash after step."""
-    if workflow_id not in durable_workflows:
+    wf = durable_workflows.get(workflow_id)
+    if wf is None:
         return {"error": "Workflow not found"}
 
-    wf = durable_workflows[workflow_id]
+    async with workflow_locks[workflow_id]:
+        return await advance_durable(wf, crash_after)
+
 
+async def advance_durable(wf: dict, crash_after: bool):
+    """Run the durable workflow's next step; the caller holds the workflow's lock."""
     if wf["current_step"] >= len(wf["steps"]):
         wf["status"] = "completed"
         return {"status": "completed", "history": wf["history"]}
@@ -329,7 +511,8 @@ async def execute_durable_step(workflow_id: str, crash_after: bool = False):
     step_name = wf["steps"][wf["current_step"]]
 
     # Simulate step execution
-    await asyncio.sleep(0.5)
+    if LATENCY_SCALE:
+        await asyncio.sleep(0.5 * LATENCY_SCALE)
 
     result = {
         "step": step_name,
@@ -340,6 +523,7 @@ async def execute_durable_step(workflow_id: str, crash_after: bool = False):
     # Record in history (this is what makes it durable)
     wf["history"].append(result)
     wf["current_step"] += 1
+    persist_durable({"op": "step", "id": wf["id"], "result": result})
 
     if crash_after:
         # Simulate crash - workflow state is preserved
@@ -360,14 +544,30 @@ async def execute_durable_step(workflow_id: str, crash_after: bool = False):
     }
 
 
+@router.post("/durable/{workflow_id}/run")
+async def run_durable_workflow(workflow_id: str):
+    """Execute every remaining step in one request."""
+    wf = durable_workflows.get(workflow_id)
+    if wf is None:
+        return {"error": "Workflow not found"}
+
+    async with workflow_locks[workflow_id]:
+        while wf["current_step"] < len(wf["steps"]):
+            await advance_durable(wf, crash_after=False)
+            if wf["current_step"] % DURABLE_RUN_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        wf["status"] = "completed"
+
+    return {"status": "completed", "history": wf["history"]}
+
+
 @router.post("/durable/{workflow_id}/recover")
 async def recover_durable_workflow(workflow_id: str):
     """Recover workflow from history after crash."""
-    if workflow_id not in durable_workflows:
+    wf = durable_workflows.get(workflow_id)
+    if wf is None:
         return {"error": "Workflow not found"}
 
-    wf = durable_workflows[workflow_id]
-
     return {
         "status": "recovered",
         "completed_steps": len(wf["history"]),
@@ -380,10 +580,11 @@ async def recover_durable_workflow(workflow_id: str):
 @router.get("/durable/{workflow_id}")
 async def get_durable_workflow(workflow_id: str):
     """Get durable workflow state."""
-    if workflow_id not in durable_workflows:
+    wf = durable_workflows.get(workflow_id)
+    if wf is None:
         return {"error": "Workflow not found"}
 
-    return durable_workflows[workflow_id]
+    return ORJSONResponse(wf)
 
 
 # ============ Reset ============
@@ -395,5 +596,9 @@ async def reset_all():
     event_logs.clear()
     event_store.clear()
     projections.clear()
+    snapshots.clear()
     durable_workflows.clear()
+    workflow_locks.clear()
+    if DURABLE_LOG_PATH:
+        await asyncio.to_thread(truncate_durable_log)
     return {"status": "reset"}
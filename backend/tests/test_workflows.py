@@ -0,0 +1,42 @@
+"""Event sourcing endpoints. Run from backend/: python -m unittest tests.test_workflows"""
+import unittest
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from routers.workflows import router
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.include_router(router)
+client = TestClient(app)
+
+
+class UnknownEventTypeTest(unittest.TestCase):
+    def setUp(self):
+        client.post("/api/workflows/reset")
+
+    def append(self, event_type: str, data: dict) -> dict:
+        response = client.post(
+            "/api/workflows/events/append",
+            json={"aggregate_id": "acct", "event_type": event_type, "data": data},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_append_ignores_amount_of_unknown_type(self):
+        self.append("deposit", {"amount": 50})
+        for amount in ("n/a", None):
+            body = self.append("note", {"amount": amount})
+            self.assertEqual(body["projection"]["balance"], 50)
+
+    def test_replay_ignores_amount_of_unknown_type(self):
+        self.append("deposit", {"amount": 50})
+        self.append("note", {"amount": "n/a"})
+        self.append("withdraw", {"amount": 20})
+
+        response = client.post("/api/workflows/events/acct/replay")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([step["amount"] for step in body["replay_log"]], [50, "n/a", 20])
+        self.assertEqual([step["balance_after"] for step in body["replay_log"]], [50, 50, 30])
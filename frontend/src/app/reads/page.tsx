@@ -7,6 +7,9 @@ import { useEventLog } from "@/lib/hooks";
 
 const API_BASE = "http://localhost:8000/api/reads";
 
+// Read endpoints don't carry counters; fetch them once a demo step finishes
+const fetchStats = () => fetch(`${API_BASE}/stats`).then((r) => r.json());
+
 // ============ Cache vs No Cache Demo ============
 
 function CacheDemo() {
@@ -38,10 +41,11 @@ function CacheDemo() {
     const data2 = await res2.json();
     addLog(`${data2.latency_ms}ms - HIT (from cache, ~25x faster!)`, "cache");
 
+    const { general } = await fetchStats();
     setStats({
-      hits: data2.stats?.cache_hits || 0,
-      misses: data2.stats?.cache_misses || 0,
-      dbReads: data2.stats?.db_reads || 0,
+      hits: general.cache_hits,
+      misses: general.cache_misses,
+      dbReads: general.db_reads,
     });
     setRunning(false);
   };
@@ -84,15 +88,15 @@ function CacheDemo() {
     );
     const time2 = Date.now() - start2;
     const hits = results.filter((r) => r.source === "cache").length;
-    const lastStats = results[results.length - 1].stats;
 
     addLog(`With cache: ${time2}ms total (${hits} cache hits, ${10 - hits} DB queries)`, "cache");
     addLog(`Saved ${time1 - time2}ms (${Math.round((1 - time2/time1) * 100)}% faster)`, "success");
 
+    const { general } = await fetchStats();
     setStats({
-      hits: lastStats?.cache_hits || 0,
-      misses: lastStats?.cache_misses || 0,
-      dbReads: lastStats?.db_reads || 0,
+      hits: general.cache_hits,
+      misses: general.cache_misses,
+      dbReads: general.db_reads,
     });
     setRunning(false);
   };
@@ -150,9 +154,8 @@ function ReplicaDemo() {
     const data = await res.json();
 
     addLog(`${data.latency_ms}ms from ${data.source}`, "success");
-    if (data.stats?.replica_reads) {
-      setReplicaStats(data.stats.replica_reads);
-    }
+    const { general } = await fetchStats();
+    setReplicaStats(general.replica_reads);
     setRunning(false);
   };
 
@@ -161,26 +164,24 @@ function ReplicaDemo() {
     addLog("Burst: 20 reads across replicas...");
 
     const start = Date.now();
-    const results = await Promise.all(
+    await Promise.all(
       Array.from({ length: 20 }, () =>
         fetch(`${API_BASE}/replica/read`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ key: `product:${Math.floor(Math.random() * 10)}` }),
-        }).then((r) => r.json())
+        })
       )
     );
 
     const totalTime = Date.now() - start;
-    const lastStats = results[results.length - 1].stats;
+    const { general } = await fetchStats();
 
     addLog(`Completed in ${totalTime}ms`, "success");
-    if (lastStats?.replica_reads) {
-      setReplicaStats(lastStats.replica_reads);
-      addLog(
-        `Load: R0=${lastStats.replica_reads[0]}, R1=${lastStats.replica_reads[1]}, R2=${lastStats.replica_reads[2]}`
-      );
-    }
+    setReplicaStats(general.replica_reads);
+    addLog(
+      `Load: R0=${general.replica_reads[0]}, R1=${general.replica_reads[1]}, R2=${general.replica_reads[2]}`
+    );
     setRunning(false);
   };
 
@@ -193,7 +194,7 @@ function ReplicaDemo() {
   return (
     <DemoSection
       title="Read Replicas"
-      description="Distribute read load across multiple database replicas. Each read goes to a random replica."
+      description="Distribute read load across multiple database replicas. Each read goes to the least busy replica."
       running={running}
       status={running ? "active" : "idle"}
       logs={logs}
@@ -254,21 +255,19 @@ function StampedeDemo() {
 
     const totalTime = Date.now() - start;
     const rebuilds = results.filter((r) => r.rebuilt).length;
-    const lastStats = results.find((r) => r.stats)?.stats;
+    const { stampede } = await fetchStats();
 
     if (protected_) {
-      addLog(`Only 1 rebuild (others waited for lock)`, "success");
+      addLog(`Only 1 rebuild (others shared its result)`, "success");
     } else {
       addLog(`${rebuilds} concurrent rebuilds!`, rebuilds > 1 ? "error" : "success");
     }
     addLog(`Completed in ${totalTime}ms`);
 
-    if (lastStats) {
-      setStats({
-        maxConcurrent: lastStats.max_concurrent || 0,
-        totalRebuilds: lastStats.total_rebuilds || 0,
-      });
-    }
+    setStats({
+      maxConcurrent: stampede.max_concurrent,
+      totalRebuilds: stampede.total_rebuilds,
+    });
     setRunning(false);
   };
 
@@ -281,7 +280,7 @@ function StampedeDemo() {
   return (
     <DemoSection
       title="Cache Stampede"
-      description="When cache expires, many requests hit DB simultaneously. Lock-based protection serializes rebuilds."
+      description="When cache expires, many requests hit DB simultaneously. Request coalescing shares a single rebuild."
       running={running}
       status={running ? "active" : stats.maxConcurrent > 5 ? "error" : "idle"}
       logs={logs}
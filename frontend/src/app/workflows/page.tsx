@@ -127,6 +127,7 @@ function SagaDemo() {
 function EventSourcingDemo() {
   const [logs, addLog, clearLogs] = useEventLog();
   const [events, setEvents] = useState<Array<{ type: string; data: { amount: number }; version: number }>>([]);
+  const [eventCount, setEventCount] = useState(0);
   const [balance, setBalance] = useState(0);
   const [running, setRunning] = useState(false);
   const aggregateId = "account-1";
@@ -135,6 +136,7 @@ function EventSourcingDemo() {
     const res = await fetch(`${API_BASE}/events/${aggregateId}`);
     const data = await res.json();
     setEvents(data.events || []);
+    setEventCount(data.total_events || 0);
     setBalance(data.projection?.balance || 0);
   }, []);
 
@@ -163,6 +165,9 @@ function EventSourcingDemo() {
     addLog("Replaying events from log...");
     const res = await fetch(`${API_BASE}/events/${aggregateId}/replay`, { method: "POST" });
     const data = await res.json();
+    if (data.snapshot_version) {
+      addLog(`Starting from snapshot at version ${data.snapshot_version}`);
+    }
     for (const step of data.replay_log || []) {
       addLog(`Replay: ${step.event} $${step.amount} → Balance: $${step.balance_after}`);
       await new Promise((r) => setTimeout(r, 300));
@@ -176,6 +181,7 @@ function EventSourcingDemo() {
     await fetch(`${API_BASE}/events/${aggregateId}`, { method: "DELETE" });
     clearLogs();
     setEvents([]);
+    setEventCount(0);
     setBalance(0);
   };
 
@@ -200,7 +206,7 @@ function EventSourcingDemo() {
         Reset
       </Button>
       <div className="w-full flex items-center justify-between text-sm">
-        <span className="text-muted-foreground">{events.length} events</span>
+        <span className="text-muted-foreground">{eventCount} events</span>
         <span className="font-mono font-bold">Balance: ${balance}</span>
       </div>
     </DemoSection>